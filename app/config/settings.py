@@ -2,6 +2,9 @@ SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "XRPUSDT"]
 BASE_CAPITAL = 100.0  # $
 RISK_STEPS = [0.5, 1.0, 1.5, 2.0, 2.5, 3.0]  # %
 MIN_RR = 1.5
+PORTFOLIO_RISK_CAP = 3.0  # % — суммарный риск с учётом корреляций
+CORR_WINDOW = 60  # баров для скользящих корреляций/бет
+SETUPS = ["Пробой", "Откат к EMA21"]
 DEFAULT_TF = "4h"  # options: "4h", "1d"
 BINANCE_BASE = "https://api.binance.com"
 CACHE_TTL = 60  # seconds for market data cache
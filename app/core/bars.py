@@ -0,0 +1,91 @@
+from typing import Union
+import numpy as np
+import pandas as pd
+
+OHLCV = ("open", "high", "low", "close", "volume")
+TIME_COLUMNS = ("open_time", "time")
+
+
+def _to_epoch_ms(values) -> np.ndarray:
+    arr = np.asarray(values)
+    if arr.dtype.kind in "iu":  # сырые Binance-таймстемпы уже в мс
+        return arr.astype(np.int64, copy=False)
+    idx = pd.DatetimeIndex(pd.to_datetime(values, utc=True))
+    return idx.as_unit("ms").asi8
+
+
+class Bars:
+    """Компактный контейнер свечей: int64 epoch-ms + непрерывные массивы OHLCV.
+
+    Срезы (`bars[a:b]`, `tail`) возвращают view без копирования данных.
+    """
+
+    __slots__ = ("time", "open", "high", "low", "close", "volume")
+
+    def __init__(self, time, open, high, low, close, volume, dtype=np.float64):
+        self.time = np.ascontiguousarray(time, dtype=np.int64)
+        self.open = np.ascontiguousarray(open, dtype=dtype)
+        self.high = np.ascontiguousarray(high, dtype=dtype)
+        self.low = np.ascontiguousarray(low, dtype=dtype)
+        self.close = np.ascontiguousarray(close, dtype=dtype)
+        self.volume = np.ascontiguousarray(volume, dtype=dtype)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, dtype=np.float64) -> "Bars":
+        """DataFrame → Bars. Колонки уже нужного dtype не копируются.
+
+        open/high/low/close обязательны (KeyError); нет volume — нули.
+        """
+        missing = [c for c in OHLCV[:4] if c not in df.columns]
+        if missing:
+            raise KeyError(f"Bars.from_frame: нет колонок {missing}")
+        for col in TIME_COLUMNS:
+            if col in df.columns:
+                t = _to_epoch_ms(df[col])
+                break
+        else:
+            t = _to_epoch_ms(df.index) if isinstance(df.index, pd.DatetimeIndex) else np.arange(len(df), dtype=np.int64)
+        cols = [df[c].to_numpy(dtype=dtype, copy=False) for c in OHLCV[:4]]
+        volume = df["volume"].to_numpy(dtype=dtype, copy=False) if "volume" in df.columns else np.zeros(len(df), dtype=dtype)
+        return cls(t, *cols, volume, dtype=dtype)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Bars → DataFrame в формате MarketDataProvider.klines (индекс `time`), без копии OHLCV."""
+        index = pd.DatetimeIndex(pd.to_datetime(self.time, unit="ms"), name="time")
+        return pd.DataFrame({c: getattr(self, c) for c in OHLCV}, index=index, copy=False)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.close.dtype
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, c).nbytes for c in self.__slots__)
+
+    def astype(self, dtype) -> "Bars":
+        return Bars(self.time, *(getattr(self, c) for c in OHLCV), dtype=dtype)
+
+    def tail(self, n: int) -> "Bars":
+        return self[max(0, len(self) - n):]
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self.__slots__:
+                raise KeyError(key)
+            return getattr(self, key)
+        if isinstance(key, slice):
+            out = Bars.__new__(Bars)
+            for c in self.__slots__:
+                setattr(out, c, getattr(self, c)[key])
+            return out
+        raise TypeError(f"Unsupported Bars index: {key!r}")
+
+    def __repr__(self) -> str:
+        return f"Bars(n={len(self)}, dtype={self.dtype})"
+
+
+def as_bars(data: Union[pd.DataFrame, Bars], dtype=np.float64) -> Bars:
+    return data if isinstance(data, Bars) else Bars.from_frame(data, dtype=dtype)
@@ -0,0 +1,198 @@
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from ..config.settings import CORR_WINDOW
+from .bars import Bars, as_bars
+
+REGIMES = ("low", "normal", "high")
+MIN_VOL = 1e-9  # ниже — символ стоит на месте (шум округления инкрементальных сумм)
+
+
+def align_closes(data: Dict[str, Union[pd.DataFrame, Bars]]) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """Свести close всех символов на общую ось времени (объединение меток, ffill пропусков).
+
+    Возвращает (times int64 мс, symbols, closes T×N); до первой свечи символа — NaN.
+    """
+    symbols = list(data)
+    bars = [as_bars(data[s]) for s in symbols]
+    times = np.unique(np.concatenate([b.time for b in bars])) if bars else np.empty(0, dtype=np.int64)
+    closes = np.full((len(times), len(symbols)), np.nan)
+    for j, b in enumerate(bars):
+        closes[np.searchsorted(times, b.time), j] = b.close
+    closes = pd.DataFrame(closes, copy=False).ffill().to_numpy()
+    return times, symbols, closes
+
+
+def _raw_log_returns(closes: np.ndarray) -> np.ndarray:
+    """Лог-доходности по close с ffill пропусков (как в update); неопределённые — NaN."""
+    filled = pd.DataFrame(closes, copy=False).ffill().to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = np.diff(np.log(filled), axis=0, prepend=np.nan)
+    return np.where(np.isfinite(r), r, np.nan)
+
+
+def log_returns(closes: np.ndarray) -> np.ndarray:
+    """Лог-доходности T×N; первая строка и бары до начала истории символа — 0."""
+    return np.nan_to_num(_raw_log_returns(closes), nan=0.0)
+
+
+class RollingCorrelation:
+    """Скользящие корреляции/беты по всей вселенной и режим волатильности по символу.
+
+    Держит кольцевой буфер последних `window` доходностей R (window×N) с маской наличия M
+    и суммы по парам S = RᵀM, Q = RᵀR, P = (R²)ᵀM, K = MᵀM, так что новый бар обновляет
+    всё за O(N²) векторно, без циклов по парам. Статистика пары считается только по барам,
+    где доходность есть у обоих: символ, листингованный недавно, не разбавляется нулями.
+    Режим: текущая скользящая волатильность против долгой EWMA-волатильности
+    (взвешенное среднее r² только по фактическим доходностям, как ewm(adjust=True));
+    пока у символа меньше `window` доходностей, режим — "normal".
+    """
+
+    def __init__(self, symbols: List[str], window: int = CORR_WINDOW, benchmark: Optional[str] = "BTCUSDT",
+                 long_halflife: int = 250, low_ratio: float = 0.75, high_ratio: float = 1.33):
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.window = window
+        if benchmark is not None and benchmark not in self.index:
+            raise ValueError(f"benchmark {benchmark!r} нет среди символов")
+        self.bench_idx = None if benchmark is None else self.index[benchmark]
+        self.long_alpha = 1 - 0.5 ** (1 / long_halflife)
+        self.low_ratio = low_ratio
+        self.high_ratio = high_ratio
+        n = len(self.symbols)
+        self._buf = np.zeros((window, n))
+        self._mask = np.zeros((window, n))
+        self._pos = 0
+        self.count = 0
+        self._sum = np.zeros((n, n))   # S[i, j] = Σ r_i по барам, где есть i и j
+        self._sq = np.zeros((n, n))    # Q[i, j] = Σ r_i r_j
+        self._sq1 = np.zeros((n, n))   # P[i, j] = Σ r_i² по барам, где есть i и j
+        self._cnt = np.zeros((n, n))   # K[i, j] = число таких баров
+        self._ew_num = np.zeros(n)  # Σ w·r² и Σ w, w = (1-α)^возраст доходности
+        self._ew_den = np.zeros(n)
+        self._n_obs = np.zeros(n, dtype=np.int64)
+        self._last_close = np.full(n, np.nan)
+        self.last_time: Optional[int] = None
+
+    @classmethod
+    def from_history(cls, data: Dict[str, Union[pd.DataFrame, Bars]], **kw) -> "RollingCorrelation":
+        times, symbols, closes = align_closes(data)
+        rc = cls(symbols, **kw)
+        rc.fit(closes)
+        if len(times):
+            rc.last_time = int(times[-1])
+        return rc
+
+    # ---------- состояние ----------
+    def fit(self, closes: np.ndarray):
+        """Пакетная инициализация по матрице close T×N (как серия update, но векторно)."""
+        raw = _raw_log_returns(closes)
+        valid = ~np.isnan(raw)
+        r = np.where(valid, raw, 0.0)
+        tail = r[-self.window:]
+        k = len(tail)
+        self._buf[:] = 0.0
+        self._buf[:k] = tail
+        self._mask[:] = 0.0
+        self._mask[:k] = valid[-self.window:]
+        self._pos = k % self.window
+        self.count = k
+        self._resum()
+        age = np.cumsum(valid[::-1], axis=0)[::-1] - 1  # сколько фактических доходностей после этой
+        w = np.where(valid, (1 - self.long_alpha) ** np.clip(age, 0, None), 0.0)
+        self._ew_num = (w * r * r).sum(axis=0)
+        self._ew_den = w.sum(axis=0)
+        self._n_obs = valid.sum(axis=0)
+        if len(closes):
+            last = pd.DataFrame(closes, copy=False).ffill().to_numpy()[-1]
+            self._last_close = np.where(np.isnan(last), self._last_close, last)
+
+    def _resum(self):
+        b, m = self._buf[:self.count], self._mask[:self.count]
+        self._sum = b.T @ m
+        self._sq = b.T @ b
+        self._sq1 = (b * b).T @ m
+        self._cnt = m.T @ m
+
+    def update(self, closes: np.ndarray, time: Optional[int] = None):
+        """Новый бар: close по всем символам (NaN — нет свечи, считается без изменения цены)."""
+        closes = np.asarray(closes, dtype=np.float64)
+        filled = np.where(np.isnan(closes), self._last_close, closes)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = np.log(filled / self._last_close)
+        valid = np.isfinite(r)
+        r = np.where(valid, r, 0.0)
+        self._last_close = np.where(np.isnan(closes), self._last_close, closes)
+
+        m = valid.astype(np.float64)
+        old, old_m = self._buf[self._pos].copy(), self._mask[self._pos].copy()
+        self._buf[self._pos] = r
+        self._mask[self._pos] = m
+        self._pos = (self._pos + 1) % self.window
+        self._sum += np.outer(r, m) - np.outer(old, old_m)
+        self._sq += np.outer(r, r) - np.outer(old, old)
+        self._sq1 += np.outer(r * r, m) - np.outer(old * old, old_m)
+        self._cnt += np.outer(m, m) - np.outer(old_m, old_m)
+        self.count = min(self.count + 1, self.window)
+        if self._pos == 0:
+            self._resum()  # сброс накопленной ошибки округления раз в окно
+        decay = 1 - self.long_alpha
+        self._ew_num = np.where(valid, decay * self._ew_num + r * r, self._ew_num)
+        self._ew_den = np.where(valid, decay * self._ew_den + 1.0, self._ew_den)
+        self._n_obs += valid
+        if time is not None:
+            self.last_time = int(time)
+
+    # ---------- результаты ----------
+    def joint_counts(self) -> np.ndarray:
+        """Число баров окна, где доходность есть у обоих символов пары (диагональ — у символа)."""
+        return np.rint(self._cnt).astype(np.int64)
+
+    def _pair_stats(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Ковариация пар и std_i по барам пары (i, j); пары без общих баров — 0."""
+        k = np.maximum(np.rint(self._cnt), 1.0)
+        mu = self._sum / k  # mu[i, j] — среднее r_i по общим с j барам
+        cov = self._sq / k - mu * mu.T
+        sd = np.sqrt(np.clip(self._sq1 / k - mu * mu, 0.0, None))
+        sd = np.where(sd > MIN_VOL, sd, 0.0)
+        return cov, sd
+
+    def covariance(self) -> np.ndarray:
+        return self._pair_stats()[0]
+
+    def volatility(self) -> np.ndarray:
+        return np.diag(self._pair_stats()[1]).copy()
+
+    def corr(self) -> np.ndarray:
+        cov, sd = self._pair_stats()
+        denom = sd * sd.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            c = np.where(denom > 0, cov / denom, 0.0)
+        c = np.clip(c, -1.0, 1.0)
+        np.fill_diagonal(c, 1.0)
+        return c
+
+    def beta_matrix(self) -> np.ndarray:
+        """B[i, j] — бета символа i к символу j (дисперсия j — по общим с i барам); 0 при нулевой vol j."""
+        cov, sd = self._pair_stats()
+        var = sd.T ** 2  # var[i, j] — дисперсия r_j на барах пары (i, j)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(var > 0, cov / var, 0.0)
+
+    def beta(self) -> np.ndarray:
+        """Бета каждого символа к бенчмарку."""
+        if self.bench_idx is None:
+            raise ValueError("бенчмарк не задан — используйте beta_matrix()")
+        return self.beta_matrix()[:, self.bench_idx]
+
+    def regimes(self) -> Dict[str, str]:
+        """Режим волатильности по символу: low / normal / high (normal до прогрева)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            long_vol = np.sqrt(np.where(self._ew_den > 0, self._ew_num / self._ew_den, 0.0))
+            ratio = np.where(long_vol > 0, self.volatility() / long_vol, 1.0)
+        labels = np.digitize(ratio, [self.low_ratio, self.high_ratio])
+        labels = np.where((self._n_obs >= self.window) & (long_vol > 0), labels, 1)
+        return {s: REGIMES[i] for s, i in zip(self.symbols, labels)}
+
+    def corr_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.corr(), index=self.symbols, columns=self.symbols)
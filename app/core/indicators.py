@@ -1,10 +1,28 @@
 import numpy as np
 import pandas as pd
+from .bars import Bars
 
-def ema(series: pd.Series, period: int) -> pd.Series:
+def _ewm_mean(values: np.ndarray, **kw) -> np.ndarray:
+    return pd.Series(values, copy=False).ewm(adjust=False, **kw).mean().to_numpy()
+
+def ema(series, period: int):
+    """EMA; pd.Series → pd.Series, np.ndarray → np.ndarray."""
+    if isinstance(series, np.ndarray):
+        return _ewm_mean(series, span=period)
     return series.ewm(span=period, adjust=False).mean()
 
-def atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
+def true_range(bars: Bars) -> np.ndarray:
+    high, low, close = bars.high, bars.low, bars.close
+    prev_close = np.empty_like(close)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return tr
+
+def atr(df, period: int = 14):
+    """ATR; DataFrame → pd.Series, Bars → np.ndarray."""
+    if isinstance(df, Bars):
+        return _ewm_mean(true_range(df), span=period)
     high = df["high"]; low = df["low"]; close = df["close"]
     prev_close = close.shift(1)
     tr = pd.concat([
@@ -14,19 +32,34 @@ def atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
     ], axis=1).max(axis=1)
     return tr.ewm(span=period, adjust=False).mean()
 
-def rsi(series: pd.Series, period: int = 14) -> pd.Series:
+def atr_sma(df, period: int = 14):
+    """ATR как простое скользящее среднее TR (вариант вкладки входа); DataFrame → pd.Series, Bars → np.ndarray."""
+    if isinstance(df, Bars):
+        return pd.Series(true_range(df), copy=False).rolling(period).mean().to_numpy()
+    high_low = df["high"] - df["low"]
+    high_close = (df["high"] - df["close"].shift(1)).abs()
+    low_close = (df["low"] - df["close"].shift(1)).abs()
+    tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+    return tr.rolling(period).mean()
+
+def rsi(series, period: int = 14):
+    if isinstance(series, np.ndarray):
+        return rsi(pd.Series(series, copy=False), period).to_numpy()
     delta = series.diff()
     gain = (delta.clip(lower=0)).ewm(alpha=1/period, adjust=False).mean()
     loss = (-delta.clip(upper=0)).ewm(alpha=1/period, adjust=False).mean()
     rs = gain / (loss + 1e-9)
     return 100 - (100 / (1 + rs))
 
-def anchored_vwap(df: pd.DataFrame, anchor_idx: int) -> float:
-    """Simple anchored VWAP from anchor_idx to current."""
+def anchored_vwap(df, anchor_idx: int) -> float:
+    """Simple anchored VWAP (close-only) from anchor_idx to current. Accepts DataFrame or Bars.
+
+    For many anchors use profile.VolumeEngine (typical price, O(1) per anchor).
+    """
     if anchor_idx < 0:
         anchor_idx = 0
-    prices = df["close"].values
-    vols = df["volume"].values
+    prices = np.asarray(df["close"])
+    vols = np.asarray(df["volume"])
     p = prices[anchor_idx:]
     v = vols[anchor_idx:]
     if v.sum() == 0:
@@ -1,8 +1,10 @@
 from dataclasses import dataclass
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Union
 import pandas as pd
 import numpy as np
+from .bars import Bars, as_bars
 from .indicators import ema, atr, anchored_vwap
+from .profile import VolumeEngine
 
 @dataclass
 class SwingPoint:
@@ -18,23 +20,33 @@ class Zone:
     anchor_idx: int
 
 class LevelBuilder:
-    def __init__(self, df: pd.DataFrame):
-        self.df = df.copy()
-        self.df["ema21"] = ema(self.df["close"], 21)
-        self.df["ema50"] = ema(self.df["close"], 50)
-        self.df["ema100"] = ema(self.df["close"], 100)
-        self.df["atr14"] = atr(self.df, 14)
-
-    def find_swings(self, lookback: int = 2) -> List[SwingPoint]:
-        highs = self.df["high"].values
-        lows = self.df["low"].values
+    def __init__(self, data: Union[pd.DataFrame, Bars]):
+        self.bars = as_bars(data)
+        self.ema21 = ema(self.bars.close, 21)
+        self.ema50 = ema(self.bars.close, 50)
+        self.ema100 = ema(self.bars.close, 100)
+        self.atr14 = atr(self.bars, 14)
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """DataFrame-вид (OHLCV + индикаторы) для отображения; в расчётах не используется."""
+        df = self.bars.to_frame()
+        for c in ("ema21", "ema50", "ema100", "atr14"):
+            df[c] = getattr(self, c)
+        return df
+
+    def find_swings(self, lookback: int = 2, start: int = 0) -> List[SwingPoint]:
+        """Свинги с idx >= start (свинг на i подтверждается на баре i + lookback)."""
+        highs = self.bars.high
+        lows = self.bars.low
         swings: List[SwingPoint] = []
-        for i in range(lookback, len(self.df) - lookback):
+        for i in range(max(lookback, start), len(self.bars) - lookback):
             window_h = highs[i-lookback:i+lookback+1]
             window_l = lows[i-lookback:i+lookback+1]
-            if highs[i] == window_h.max() and (highs[i] > window_h[:-1]).all() and (highs[i] > window_h[1:]).all():
+            # строго выше/ниже соседей (без самой свечи i в окне сравнения)
+            if (highs[i] > window_h[:lookback]).all() and (highs[i] > window_h[lookback+1:]).all():
                 swings.append(SwingPoint(i, float(highs[i]), 'high'))
-            if lows[i] == window_l.min() and (lows[i] < window_l[:-1]).all() and (lows[i] < window_l[1:]).all():
+            if (lows[i] < window_l[:lookback]).all() and (lows[i] < window_l[lookback+1:]).all():
                 swings.append(SwingPoint(i, float(lows[i]), 'low'))
         swings.sort(key=lambda s: s.idx)
         return swings
@@ -53,8 +65,11 @@ class LevelBuilder:
     def bos(self, swings: List[SwingPoint]) -> Optional[Tuple[str,int,float]]:
         if len(swings) < 3:
             return None
-        last = swings[-1]
-        prev_same = [s for s in swings[:-1] if s.kind==last.kind]
+        return self._bos_at(swings, len(swings) - 1)
+
+    def _bos_at(self, swings: List[SwingPoint], j: int) -> Optional[Tuple[str,int,float]]:
+        last = swings[j]
+        prev_same = [s for s in swings[:j] if s.kind==last.kind]
         if not prev_same:
             return None
         prev = prev_same[-1]
@@ -64,48 +79,102 @@ class LevelBuilder:
             return ("bear", last.idx, last.price)
         return None
 
-    def impulse_zone(self, kind: str, bars_back: int = 3) -> Optional[Zone]:
-        swings = self.find_swings()
-        b = self.bos(swings)
-        if b is None:
-            return None
-        side, idx, _ = b
-        if (kind=="demand" and side!="bull") or (kind=="supply" and side!="bear"):
-            return None
+    def _zone_from_bos(self, kind: str, idx: int, bars_back: int) -> Zone:
         base_idx = max(0, idx - bars_back)
-        atr_buf = float(self.df["atr14"].iloc[idx]) * 0.25
+        atr_buf = float(self.atr14[idx]) * 0.25
         if kind == "demand":
-            lo = float(self.df["low"].iloc[base_idx])
-            hi = float(self.df["close"].iloc[base_idx])
+            lo = float(self.bars.low[base_idx])
+            hi = float(self.bars.close[base_idx])
         else:
-            hi = float(self.df["high"].iloc[base_idx])
-            lo = float(self.df["close"].iloc[base_idx])
+            hi = float(self.bars.high[base_idx])
+            lo = float(self.bars.close[base_idx])
         lo2 = max(0.0, lo - atr_buf)
         hi2 = hi + atr_buf
         return Zone(kind=kind, start_price=lo2 if kind=="demand" else lo, end_price=hi2 if kind=="supply" else hi, anchor_idx=base_idx)
 
-    def htf_trend(self) -> str:
-        e100 = self.df["ema100"]
-        slope = float(e100.iloc[-1] - e100.iloc[-10])
-        if slope > 0 and float(self.df["close"].iloc[-1]) > float(self.df["ema50"].iloc[-1]):
+    def impulse_zone(self, kind: str, bars_back: int = 3) -> Optional[Zone]:
+        return self._zone_for_bos(self.bos(self.find_swings()), kind, bars_back)
+
+    def _zone_for_bos(self, b: Optional[Tuple[str,int,float]], kind: str, bars_back: int = 3) -> Optional[Zone]:
+        if b is None:
+            return None
+        side, idx, _ = b
+        if (kind=="demand" and side!="bull") or (kind=="supply" and side!="bear"):
+            return None
+        return self._zone_from_bos(kind, idx, bars_back)
+
+    def zone_history(self, lookback: int = 2, bars_back: int = 3, start: int = 0,
+                     state: Optional[dict] = None) -> List[Tuple[int, Zone]]:
+        """Зоны demand/supply по каждому BOS среди свингов с idx >= start: [(confirm_idx, Zone)].
+
+        confirm_idx — бар, на котором свинг BOS становится известен (idx + lookback).
+        state ({"high", "low", "count"}: последние цены свингов и их число) переносит контекст
+        между вызовами, чтобы не пересканировать историю до start; обновляется на месте.
+        """
+        if state is None:
+            state = {}
+        last = {"high": state.get("high"), "low": state.get("low")}
+        count = state.get("count", 0)
+        out: List[Tuple[int, Zone]] = []
+        for s in self.find_swings(lookback, start):
+            prev = last[s.kind]
+            # то же, что _bos_at: нужны >= 3 свинга и предыдущий свинг того же типа
+            if count >= 2 and prev is not None:
+                if s.kind == "high" and s.price > prev:
+                    out.append((s.idx + lookback, self._zone_from_bos("demand", s.idx, bars_back)))
+                elif s.kind == "low" and s.price < prev:
+                    out.append((s.idx + lookback, self._zone_from_bos("supply", s.idx, bars_back)))
+            last[s.kind] = s.price
+            count += 1
+        state.update(high=last["high"], low=last["low"], count=count)
+        return out
+
+    def volume_levels(self, swings: List[SwingPoint], bins: int = 50, at: int = -1,
+                      engine: Optional[VolumeEngine] = None, start: int = 0) -> dict:
+        """Объёмные уровни: anchored VWAP от последних свинг-хая/лоя и POC/VAH/VAL по барам [start, at]."""
+        engine = engine or VolumeEngine(self.bars)
+        out = {"vwap_high": None, "vwap_low": None, "poc": None, "vah": None, "val": None}
+        for kind in ("high", "low"):
+            last = next((s for s in reversed(swings) if s.kind == kind), None)
+            if last is not None:
+                out[f"vwap_{kind}"] = engine.vwap(last.idx, at)
+        prof = engine.profile(start, at, bins=bins) if bins else None
+        if prof is not None:
+            out.update(poc=prof.poc, vah=prof.vah, val=prof.val)
+        return out
+
+    def htf_trend(self, at: int = -1) -> str:
+        i = at if at >= 0 else len(self.bars) + at
+        if i < 9:  # наклон EMA100 за 9 баров ещё не определён
+            return "range"
+        e100 = self.ema100
+        slope = float(e100[i] - e100[i - 9])
+        if slope > 0 and float(self.bars.close[i]) > float(self.ema50[i]):
             return "up"
-        if slope < 0 and float(self.df["close"].iloc[-1]) < float(self.df["ema50"].iloc[-1]):
+        if slope < 0 and float(self.bars.close[i]) < float(self.ema50[i]):
             return "down"
         return "range"
 
-    def build_summary(self) -> dict:
-        swings = self.find_swings()
-        structure = self.last_structure(swings)
+    def summary_at(self, i: int, swings: List[SwingPoint], engine: Optional[VolumeEngine] = None,
+                   profile_start: int = 0, bins: int = 50) -> dict:
+        """Сводка на баре i; swings — только свинги, уже известные на этом баре."""
         bos_info = self.bos(swings)
-        demand = self.impulse_zone("demand")
-        supply = self.impulse_zone("supply")
         return {
-            "structure": structure,
+            "structure": self.last_structure(swings),
             "bos": bos_info,
-            "demand": demand,
-            "supply": supply,
-            "ema21": float(self.df["ema21"].iloc[-1]),
-            "ema50": float(self.df["ema50"].iloc[-1]),
-            "ema100": float(self.df["ema100"].iloc[-1]),
-            "atr14": float(self.df["atr14"].iloc[-1]),
+            "demand": self._zone_for_bos(bos_info, "demand"),
+            "supply": self._zone_for_bos(bos_info, "supply"),
+            "ema21": float(self.ema21[i]),
+            "ema50": float(self.ema50[i]),
+            "ema100": float(self.ema100[i]),
+            "atr14": float(self.atr14[i]),
+            **self.volume_levels(swings, bins, i, engine, profile_start),
         }
+
+    def build_summary(self, zone_index=None) -> dict:
+        """zone_index (ZoneIndex, опционально) синхронизируется и даёт zone_confluence у текущей цены."""
+        summary = self.summary_at(len(self.bars) - 1, self.find_swings())
+        if zone_index is not None:
+            zone_index.sync(self)
+            summary["zone_confluence"] = zone_index.confluence(float(self.bars.close[-1]), 0.5 * float(self.atr14[-1]))
+        return summary
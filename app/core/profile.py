@@ -0,0 +1,175 @@
+from dataclasses import dataclass
+from typing import List, Optional, Union
+import numpy as np
+import pandas as pd
+from .bars import Bars, as_bars
+
+
+@dataclass
+class VolumeProfile:
+    edges: np.ndarray   # границы бинов цены, len = bins + 1
+    volume: np.ndarray  # объём в бине, len = bins
+    poc: float          # point of control — центр бина с макс. объёмом
+    val: float          # нижняя граница value area
+    vah: float          # верхняя граница value area
+
+
+class VolumeEngine:
+    """Префиксные суммы typical price × volume и volume по Bars.
+
+    Anchored VWAP от любого якоря до любого бара — O(1); для массива якорей — векторно.
+    """
+
+    def __init__(self, data: Union[pd.DataFrame, Bars]):
+        self.bars = as_bars(data)
+        b = self.bars
+        tp = (b.high.astype(np.float64) + b.low + b.close) / 3.0
+        vol = b.volume.astype(np.float64)
+        self._cum_pv = np.concatenate(([0.0], np.cumsum(tp * vol)))
+        self._cum_v = np.concatenate(([0.0], np.cumsum(vol)))
+
+    def _end(self, end: Optional[int]) -> int:
+        n = len(self.bars)
+        if end is None:
+            return n - 1
+        return end + n if end < 0 else end
+
+    def vwap(self, anchor_idx: int, end: Optional[int] = None) -> float:
+        """VWAP по typical price на барах [anchor_idx, end] (end по умолчанию — последний)."""
+        return float(self.anchored_vwaps(np.array([anchor_idx]), end)[0])
+
+    def anchored_vwaps(self, anchors, end: Optional[int] = None) -> np.ndarray:
+        """VWAP от каждого якоря до end; при нулевом объёме — close[end]."""
+        e = self._end(end)
+        a = np.clip(np.asarray(anchors, dtype=np.int64), 0, e)
+        pv = self._cum_pv[e + 1] - self._cum_pv[a]
+        v = self._cum_v[e + 1] - self._cum_v[a]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = pv / v
+        return np.where(v > 0, out, float(self.bars.close[e]))
+
+    def swing_vwaps(self, swings: List, end: Optional[int] = None) -> List[dict]:
+        """Anchored VWAP от каждого свинга (SwingPoint из LevelBuilder.find_swings)."""
+        vals = self.anchored_vwaps([s.idx for s in swings], end)
+        return [{"idx": s.idx, "kind": s.kind, "vwap": float(v)} for s, v in zip(swings, vals)]
+
+    def profile(self, start: int = 0, end: Optional[int] = None, bins: int = 50,
+                value_area: float = 0.7) -> Optional[VolumeProfile]:
+        """Volume-by-price на барах [start, end]: объём свечи равномерно по её диапазону [low, high].
+
+        start/end < 0 отсчитываются от конца (start=-50 — последние 50 баров);
+        None, если баров нет или суммарный объём нулевой.
+        """
+        e = self._end(end)
+        s = start + len(self.bars) if start < 0 else start
+        b = self.bars[max(0, s):e + 1]
+        if len(b) == 0:
+            return None
+        lo = b.low.astype(np.float64)
+        hi = b.high.astype(np.float64)
+        vol = b.volume.astype(np.float64)
+        edges = self._edges(float(lo.min()), float(hi.max()), bins)
+        # доля объёма свечи ниже каждой границы бина; бин = разность соседних границ
+        span = hi - lo
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frac = np.clip((edges[None, :] - lo[:, None]) / span[:, None], 0.0, 1.0)
+        frac = np.where(span[:, None] > 0, frac, (edges[None, :] > lo[:, None]).astype(np.float64))
+        frac[:, -1] = 1.0  # свеча целиком ≤ pmax
+        hist = (np.diff(frac, axis=1) * vol[:, None]).sum(axis=0)
+        return self._with_value_area(edges, hist, value_area)
+
+    @staticmethod
+    def _edges(pmin: float, pmax: float, bins: int) -> np.ndarray:
+        if pmax <= pmin:
+            pmax = pmin + max(abs(pmin), 1.0) * 1e-9
+        return np.linspace(pmin, pmax, bins + 1)
+
+    @staticmethod
+    def _with_value_area(edges: np.ndarray, hist: np.ndarray, value_area: float) -> Optional[VolumeProfile]:
+        if not hist.sum() > 0:  # нет объёма (например, фолбэк CoinGecko) — POC/value area не определены
+            return None
+        poc_i = int(np.argmax(hist))
+        target = hist.sum() * value_area
+        lo_i = hi_i = poc_i
+        acc = hist[poc_i]
+        # классическое расширение от POC в сторону большего соседнего бина
+        while acc < target and (lo_i > 0 or hi_i < len(hist) - 1):
+            below = hist[lo_i - 1] if lo_i > 0 else -1.0
+            above = hist[hi_i + 1] if hi_i < len(hist) - 1 else -1.0
+            if above >= below:
+                hi_i += 1
+                acc += above
+            else:
+                lo_i -= 1
+                acc += below
+        poc = float((edges[poc_i] + edges[poc_i + 1]) / 2)
+        return VolumeProfile(edges=edges, volume=hist, poc=poc, val=float(edges[lo_i]), vah=float(edges[hi_i + 1]))
+
+
+class PrefixProfile:
+    """Профиль объёма на растущем префиксе баров [0, t] — для побарного реплея.
+
+    Те же бины и та же модель, что у VolumeEngine.profile(0, t), но без пересчёта
+    всей истории на каждом баре: доля объёма свечи ниже цены x — кусочно-линейная
+    функция, поэтому покрытие C(x) = x·ΣA − ΣB по свечам с low < x минус то же
+    по свечам с high < x. Суммы лежат в деревьях Фенвика по сжатым low/high
+    (ключи — все цены истории, добавляются только бары <= t): бар — O(log n),
+    запрос профиля — O(bins · log n).
+    """
+
+    def __init__(self, data: Union[pd.DataFrame, Bars]):
+        b = as_bars(data)
+        self._lo = b.low.astype(np.float64)
+        self._hi = b.high.astype(np.float64)
+        self._vol = b.volume.astype(np.float64)
+        self._lo_keys = np.unique(self._lo)
+        self._hi_keys = np.unique(self._hi)
+        # lo-дерево: (v/span, v·low/span, v свечей нулевой ширины); hi-дерево: (v/span, v·high/span)
+        self._lo_tree = np.zeros((len(self._lo_keys) + 1, 3))
+        self._hi_tree = np.zeros((len(self._hi_keys) + 1, 2))
+        self.count = 0
+        self._pmin, self._pmax, self._total = np.inf, -np.inf, 0.0
+
+    @staticmethod
+    def _add(tree: np.ndarray, k: int, values):
+        k += 1
+        while k < len(tree):
+            tree[k] += values
+            k += k & -k
+
+    @staticmethod
+    def _prefix(tree: np.ndarray, k: np.ndarray) -> np.ndarray:
+        """Суммы по первым k ключам для каждого k из массива."""
+        out = np.zeros((len(k), tree.shape[1]))
+        k = k.copy()
+        while k.any():
+            out += tree[k]  # tree[0] == 0
+            k -= k & -k
+        return out
+
+    def advance(self, t: int):
+        """Добавить бары до t включительно."""
+        while self.count <= t:
+            i = self.count
+            lo, hi, v = self._lo[i], self._hi[i], self._vol[i]
+            kl = int(np.searchsorted(self._lo_keys, lo))
+            span = hi - lo
+            if span > 0:
+                self._add(self._lo_tree, kl, (v / span, v * lo / span, 0.0))
+                self._add(self._hi_tree, int(np.searchsorted(self._hi_keys, hi)), (v / span, v * hi / span))
+            else:
+                self._add(self._lo_tree, kl, (0.0, 0.0, v))
+            self._pmin, self._pmax = min(self._pmin, lo), max(self._pmax, hi)
+            self._total += v
+            self.count += 1
+
+    def profile(self, bins: int = 50, value_area: float = 0.7) -> Optional[VolumeProfile]:
+        """Профиль по уже добавленным барам; None, если баров нет или объём нулевой."""
+        if self.count == 0:
+            return None
+        edges = VolumeEngine._edges(float(self._pmin), float(self._pmax), bins)
+        lo_s = self._prefix(self._lo_tree, np.searchsorted(self._lo_keys, edges, side="left"))
+        hi_s = self._prefix(self._hi_tree, np.searchsorted(self._hi_keys, edges, side="left"))
+        cover = edges * lo_s[:, 0] - lo_s[:, 1] - (edges * hi_s[:, 0] - hi_s[:, 1]) + lo_s[:, 2]
+        cover[-1] = self._total  # свеча целиком ≤ pmax
+        return VolumeEngine._with_value_area(edges, np.diff(cover), value_area)
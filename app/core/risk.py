@@ -1,5 +1,9 @@
+import math
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, Optional
+import numpy as np
+from ..config.settings import PORTFOLIO_RISK_CAP
+from .correlation import RollingCorrelation
 
 @dataclass
 class RiskAdvice:
@@ -7,6 +11,30 @@ class RiskAdvice:
     percent: float
     reason: str
 
+def rr_targets(entry: float, stop: float, direction: str, multiples=(1.0, 1.5, 2.0)):
+    r = abs(entry - stop)
+    if r == 0:
+        r = max(entry, 1) * 0.002  # страховой минимум, чтобы не делить на ноль
+    if direction == "long":
+        return [entry + m * r for m in multiples]
+    else:
+        return [entry - m * r for m in multiples]
+
+def plan_levels(close: float, ema21: float, atr14: float, prev_high: float, prev_low: float,
+                setup: str, atr_mult: float) -> dict:
+    """Entry/stop/TP вкладки входа по последней (close, ema21, atr14) и предыдущей (high/low) свечам."""
+    direction = "long" if close >= ema21 else "short"
+    if setup == "Откат к EMA21":
+        entry = float(ema21)
+    else:
+        entry = float(prev_high if direction == "long" else prev_low)
+    if direction == "long":
+        stop = entry - atr_mult * float(atr14)
+    else:
+        stop = entry + atr_mult * float(atr14)
+    tps = rr_targets(entry, stop, direction, (1.0, 1.5, 2.0))
+    return {"entry": entry, "stop": stop, "tps": tps, "direction": direction}
+
 class RiskScorer:
     def __init__(self, min_rr: float = 1.5):
         self.min_rr = min_rr
@@ -23,6 +51,8 @@ class RiskScorer:
             score += 2
         if context.get("demand") or context.get("supply"):
             score += 2
+        if context.get("zone_confluence", 0) >= 2:  # несколько исторических зон у цены
+            score += 1
         if near_news:
             score -= 2
         if against_htf:
@@ -46,3 +76,53 @@ class PositionSizer:
             return {"qty": 0.0, "risk_$": 0.0}
         qty = risk_dollars / stop_distance
         return {"qty": round(qty, 6), "risk_$": round(risk_dollars, 2)}
+
+class PortfolioRiskCheck:
+    """Риск портфеля с учётом корреляций поверх PositionSizer.
+
+    Риск позиций — знаковые % капитала (+long / -short); портфельный риск = sqrt(wᵀ C w),
+    где C — текущая корреляционная матрица RollingCorrelation. Позиции, с которыми у нового
+    символа нет общей истории, считаются полностью сонаправленными (худший случай).
+    """
+
+    def __init__(self, sizer: PositionSizer, correlation: RollingCorrelation, max_risk_pct: float = PORTFOLIO_RISK_CAP):
+        self.sizer = sizer
+        self.correlation = correlation
+        self.max_risk_pct = max_risk_pct
+
+    def _weights(self, positions: Dict[str, float]) -> np.ndarray:
+        idx = self.correlation.index
+        w = np.zeros(len(idx))
+        for sym, pct in positions.items():
+            if sym in idx:
+                w[idx[sym]] += pct
+        return w
+
+    def portfolio_risk(self, positions: Dict[str, float]) -> float:
+        w = self._weights(positions)
+        return math.sqrt(max(float(w @ self.correlation.corr() @ w), 0.0))
+
+    def check(self, positions: Dict[str, float], symbol: str, direction: str,
+              entry: float, stop: float, risk_pct: float) -> dict:
+        """Проверить новую позицию; если кап превышен — урезать риск до допустимого."""
+        sign = 1.0 if direction == "long" else -1.0
+        c = self.correlation.corr()
+        w = self._weights(positions)
+        current = float(w @ c @ w)
+        j = self.correlation.index.get(symbol)
+        # корреляция с позициями без общей истории (< 2 баров) неизвестна — худший случай: |w|
+        unknown = np.ones(len(w), dtype=bool) if j is None else self.correlation.joint_counts()[j] < 2
+        known = ~unknown
+        b = float(np.abs(w[unknown]).sum())
+        if j is not None:
+            b += sign * float(c[j, known] @ w[known])
+        # (r + b)^2 - b^2 + current <= cap^2  →  r <= -b + sqrt(b^2 - current + cap^2)
+        disc = b * b - current + self.max_risk_pct ** 2
+        allowed = max(0.0, min(risk_pct, -b + math.sqrt(disc))) if disc > 0 else 0.0
+        after = math.sqrt(max(current + 2 * b * risk_pct + risk_pct ** 2, 0.0))
+        return {
+            "ok": allowed >= risk_pct,
+            "portfolio_risk_%": round(after, 3),
+            "allowed_%": round(allowed, 3),
+            **self.sizer.size(entry, stop, allowed),
+        }
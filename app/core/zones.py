@@ -0,0 +1,244 @@
+import math
+from dataclasses import dataclass
+from typing import List, Optional
+import numpy as np
+from .levels import LevelBuilder, Zone
+
+_INACTIVE = -math.inf
+
+
+@dataclass
+class TrackedZone:
+    zone: Zone
+    created_time: int  # epoch-ms бара, на котором зона подтверждена
+    anchor_time: int   # epoch-ms базовой свечи (anchor_idx относителен окну данных)
+    touches: int = 0       # заходы цены в зону (серия баров внутри — одно касание)
+    invalidated: bool = False
+    inside: bool = False   # предыдущий бар пересекал зону
+
+    @property
+    def lo(self) -> float:
+        return self.zone.start_price
+
+    @property
+    def hi(self) -> float:
+        return self.zone.end_price
+
+    def distance(self, price: float) -> float:
+        if price < self.lo:
+            return self.lo - price
+        if price > self.hi:
+            return price - self.hi
+        return 0.0
+
+
+class _MaxTree:
+    """Дерево отрезков (max) с точечным обновлением и поиском по порогу."""
+
+    def __init__(self, values: np.ndarray):
+        self.n = len(values)
+        size = 1
+        while size < max(self.n, 1):
+            size *= 2
+        self.size = size
+        t = np.full(2 * size, _INACTIVE)
+        t[size:size + self.n] = values
+        k = size
+        while k > 1:
+            k //= 2
+            t[k:2 * k] = np.maximum(t[2 * k:4 * k:2], t[2 * k + 1:4 * k:2])
+        self.t = t.tolist()
+
+    def update(self, i: int, value: float):
+        t = self.t
+        i += self.size
+        t[i] = value
+        while i > 1:
+            i //= 2
+            t[i] = max(t[2 * i], t[2 * i + 1])
+
+    def collect(self, end: int, threshold: float) -> List[int]:
+        """Все позиции из [0, end) со значением >= threshold: O((k+1) log n)."""
+        t, out = self.t, []
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if lo >= end or t[node] < threshold:
+                continue
+            if hi - lo == 1:
+                out.append(lo)
+                continue
+            mid = (lo + hi) // 2
+            stack.append((2 * node + 1, mid, hi))
+            stack.append((2 * node, lo, mid))
+        return out
+
+    def first_from(self, start: int, threshold: float) -> Optional[int]:
+        """Первая позиция >= start со значением >= threshold."""
+        t = self.t
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if hi <= start or t[node] < threshold:
+                continue
+            if hi - lo == 1:
+                return lo if lo < self.n else None
+            mid = (lo + hi) // 2
+            stack.append((2 * node + 1, mid, hi))
+            stack.append((2 * node, lo, mid))
+        return None
+
+    def last_upto(self, end: int, threshold: float) -> Optional[int]:
+        """Последняя позиция <= end со значением >= threshold."""
+        t = self.t
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, lo, hi = stack.pop()
+            if lo > end or t[node] < threshold:
+                continue
+            if hi - lo == 1:
+                return lo
+            mid = (lo + hi) // 2
+            stack.append((2 * node, lo, mid))
+            stack.append((2 * node + 1, mid, hi))
+        return None
+
+
+class ZoneIndex:
+    """Инкрементальный индекс всех исторических зон demand/supply одного символа.
+
+    Статическая часть — зоны, отсортированные по нижней и по верхней границе, над которыми
+    построены деревья отрезков (max); свежие зоны копятся в небольшом буфере и вливаются
+    пересборкой каждые `rebuild_every` вставок. Запросы «цена внутри зоны» и «ближайшая
+    зона» — O(log n) (+ число найденных зон), инвалидация — O(log n).
+    """
+
+    def __init__(self, rebuild_every: int = 32):
+        self.rebuild_every = rebuild_every
+        self.zones: List[TrackedZone] = []
+        self.last_time: Optional[int] = None
+        self._swing_state: dict = {}  # контекст свингов для LevelBuilder.zone_history между sync
+        self._pending: List[int] = []
+        self._inside: set = set()  # id зон, которые пересекал последний бар
+        self._rebuild()
+
+    # ---------- построение ----------
+    def _rebuild(self):
+        static = list(range(len(self.zones)))
+        lo = np.array([self.zones[i].lo for i in static], dtype=np.float64)
+        hi = np.array([self.zones[i].hi for i in static], dtype=np.float64)
+        active = np.array([not self.zones[i].invalidated for i in static], dtype=bool)
+        self._by_lo = np.argsort(lo, kind="stable")
+        self._by_hi = np.argsort(hi, kind="stable")
+        self._lo_sorted = lo[self._by_lo]
+        self._hi_sorted = hi[self._by_hi]
+        # по lo-порядку храним hi (для «содержит/пересекает»), по hi-порядку — флаг активности
+        self._lo_tree = _MaxTree(np.where(active[self._by_lo], hi[self._by_lo], _INACTIVE))
+        self._hi_tree = _MaxTree(np.where(active[self._by_hi], 0.0, _INACTIVE))
+        self._pos_lo = np.empty(len(static), dtype=np.int64)
+        self._pos_lo[self._by_lo] = np.arange(len(static))
+        self._pos_hi = np.empty(len(static), dtype=np.int64)
+        self._pos_hi[self._by_hi] = np.arange(len(static))
+        self._pending = []
+
+    def add(self, zone: Zone, created_time: int, anchor_time: int) -> TrackedZone:
+        tz = TrackedZone(zone=zone, created_time=int(created_time), anchor_time=int(anchor_time))
+        self.zones.append(tz)
+        self._pending.append(len(self.zones) - 1)
+        if len(self._pending) >= self.rebuild_every:
+            self._rebuild()
+        return tz
+
+    def invalidate(self, zone_id: int):
+        tz = self.zones[zone_id]
+        if tz.invalidated:
+            return
+        tz.invalidated = True
+        if zone_id < len(self._pos_lo):
+            self._lo_tree.update(int(self._pos_lo[zone_id]), _INACTIVE)
+            self._hi_tree.update(int(self._pos_hi[zone_id]), _INACTIVE)
+
+    # ---------- запросы ----------
+    def _overlapping_ids(self, lo: float, hi: float) -> List[int]:
+        end = int(np.searchsorted(self._lo_sorted, hi, side="right"))
+        ids = [int(self._by_lo[p]) for p in self._lo_tree.collect(end, lo)]
+        ids += [i for i in self._pending
+                if not self.zones[i].invalidated and self.zones[i].lo <= hi and self.zones[i].hi >= lo]
+        return ids
+
+    def overlapping(self, lo: float, hi: float) -> List[TrackedZone]:
+        """Активные зоны, пересекающие [lo, hi]."""
+        return [self.zones[i] for i in self._overlapping_ids(lo, hi)]
+
+    def containing(self, price: float) -> List[TrackedZone]:
+        """Активные зоны, содержащие цену."""
+        return self.overlapping(price, price)
+
+    def nearest(self, price: float) -> Optional[TrackedZone]:
+        """Ближайшая активная зона (расстояние 0, если цена внутри)."""
+        inside = self.containing(price)
+        if inside:
+            return inside[0]
+        cands: List[TrackedZone] = []
+        p = self._lo_tree.first_from(int(np.searchsorted(self._lo_sorted, price, side="right")), 0.0)
+        if p is not None:
+            cands.append(self.zones[int(self._by_lo[p])])
+        k = int(np.searchsorted(self._hi_sorted, price, side="left")) - 1
+        if k >= 0:
+            p = self._hi_tree.last_upto(k, 0.0)
+            if p is not None:
+                cands.append(self.zones[int(self._by_hi[p])])
+        cands += [self.zones[i] for i in self._pending if not self.zones[i].invalidated]
+        if not cands:
+            return None
+        return min(cands, key=lambda z: z.distance(price))
+
+    def confluence(self, price: float, tolerance: float = 0.0) -> int:
+        """Число активных зон в пределах tolerance от цены."""
+        return len(self._overlapping_ids(price - tolerance, price + tolerance))
+
+    @property
+    def active(self) -> List[TrackedZone]:
+        return [z for z in self.zones if not z.invalidated]
+
+    # ---------- инкрементальное обновление ----------
+    def on_bar(self, time: int, high: float, low: float, close: float):
+        """Учесть закрытый бар: касания зон и пробой (закрытие за дальней границей).
+
+        Касание засчитывается при входе в зону — когда предыдущий бар её не пересекал.
+        """
+        overlap = set(self._overlapping_ids(low, high))
+        for i in self._inside - overlap:
+            self.zones[i].inside = False
+        for i in list(overlap):
+            tz = self.zones[i]
+            if tz.created_time >= time:  # бар подтверждения: касанием не считается
+                tz.inside = True
+                continue
+            broken = close < tz.lo if tz.zone.kind == "demand" else close > tz.hi
+            if broken:
+                self.invalidate(i)
+                overlap.discard(i)
+            elif not tz.inside:
+                tz.touches += 1
+                tz.inside = True
+        self._inside = overlap
+
+    def sync(self, builder: LevelBuilder, lookback: int = 2, bars_back: int = 3):
+        """Догнать индекс до последнего бара builder: новые зоны + касания/пробои новых баров."""
+        bars = builder.bars
+        n = len(bars)
+        start = 0 if self.last_time is None else int(np.searchsorted(bars.time, self.last_time, side="right"))
+        if start >= n:
+            return
+        new = {}
+        # только свинги, подтверждаемые на новых барах (idx + lookback >= start); более ранние уже учтены
+        for confirm_idx, zone in builder.zone_history(lookback, bars_back, max(0, start - lookback),
+                                                      self._swing_state):
+            if start <= confirm_idx < n:
+                new.setdefault(confirm_idx, []).append(zone)
+        for i in range(start, n):
+            for zone in new.get(i, ()):
+                self.add(zone, bars.time[i], bars.time[zone.anchor_idx])
+            self.on_bar(int(bars.time[i]), float(bars.high[i]), float(bars.low[i]), float(bars.close[i]))
+        self.last_time = int(bars.time[-1])
@@ -9,17 +9,25 @@ sys.path.append(str(ROOT.parent))
 import streamlit as st
 from app.ui.pages.entry import tab_entry
 from app.ui.pages.reporting import tab_reporting
+from app.ui.pages.replay import tab_replay
 from app.services.journal import TradeJournal
 from app.config.settings import JOURNAL_CSV
 
 st.set_page_config(page_title="Swing MVP", layout="wide")
 
-journal = TradeJournal(JOURNAL_CSV)
+@st.cache_resource
+def get_journal() -> TradeJournal:
+    # один экземпляр на процесс, а не конструктор (с проверкой файла) на каждый rerun
+    return TradeJournal(JOURNAL_CSV)
 
-tab1, tab2 = st.tabs(["Расчёт входа", "Отчётность"])
+journal = get_journal()
+
+tab1, tab2, tab3 = st.tabs(["Расчёт входа", "Отчётность", "Реплей"])
 with tab1:
     tab_entry(journal)
 with tab2:
     tab_reporting()
+with tab3:
+    tab_replay()
 
 st.caption("MVP: авто-свинг уровни, риск ≤ 3%, кнопочный интерфейс. Данные — публичные REST Binance.")
\ No newline at end of file
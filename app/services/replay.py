@@ -0,0 +1,117 @@
+import bisect
+import json
+from collections import deque
+from dataclasses import asdict
+from typing import Iterator, List, Optional, Sequence, Union
+import pandas as pd
+from ..config.settings import MIN_RR, SETUPS
+from ..core.bars import Bars, as_bars
+from ..core.indicators import atr_sma
+from ..core.levels import LevelBuilder, Zone
+from ..core.profile import PrefixProfile, VolumeEngine
+from ..core.risk import RiskScorer, plan_levels
+from ..core.zones import ZoneIndex
+from ..strategies.breakout import BreakoutRange
+from ..strategies.pullback import PullbackEMA21
+
+
+class BarReplay:
+    """Детерминированный побарный реплей пайплайна вкладки входа по сохранённой истории.
+
+    Снимок на баре t совпадает с пайплайном, запущенным на срезе bars[:t+1]
+    (LevelBuilder(...).build_summary(ZoneIndex()), htf, стратегии, план) — все входы
+    берутся по всему префиксу [0, t]: индикаторы, свинги, зоны, VWAP и профиль объёма.
+    Индикаторы и префиксные суммы считаются один раз по всей истории (все они причинные),
+    профиль объёма наращивается побарно (PrefixProfile). Живая вкладка видит только
+    последние `limit` баров, поэтому её EMA/ATR прогреваются иначе и профиль уже.
+    """
+
+    def __init__(self, data: Union[pd.DataFrame, Bars], symbol: str = "", lookback: int = 2,
+                 bins: int = 50, setups: Sequence[str] = SETUPS, atr_mult: float = 1.2,
+                 strategies=(BreakoutRange, PullbackEMA21), scorer: Optional[RiskScorer] = None):
+        self.symbol = symbol
+        self.lookback = lookback
+        self.bins = bins
+        self.setups = list(setups)
+        self.atr_mult = atr_mult
+        self.bars = as_bars(data)
+        self.builder = LevelBuilder(self.bars)
+        self.volume = VolumeEngine(self.bars)
+        # ATR вкладки входа (SMA TR); bfill из with_indicators на срезе [0, t] до бара t не достаёт
+        self.entry_atr = atr_sma(self.bars, 14)
+        self.strategies = [cls(self.bars) for cls in strategies]
+        self.scorer = scorer or RiskScorer(MIN_RR)
+        self._swings = self.builder.find_swings(lookback)
+        self._zones = self.builder.zone_history(lookback)
+
+    def snapshots(self, start: int = 100, end: Optional[int] = None) -> Iterator[dict]:
+        """Снимки для баров [start, end); зоны и касания всё равно прогоняются с бара 0."""
+        b = self.bars
+        n = len(b) if end is None else min(end, len(b))
+        start = max(1, start)
+        zone_index = ZoneIndex()
+        prefix = PrefixProfile(b)
+        highs, lows = deque(maxlen=3), deque(maxlen=3)
+        k = z = 0
+        for t in range(n):
+            while k < len(self._swings) and self._swings[k].idx <= t - self.lookback:
+                s = self._swings[k]
+                (highs if s.kind == "high" else lows).append(s)
+                k += 1
+            while z < len(self._zones) and self._zones[z][0] <= t:
+                zone = self._zones[z][1]
+                zone_index.add(zone, b.time[t], b.time[zone.anchor_idx])
+                z += 1
+            zone_index.on_bar(int(b.time[t]), float(b.high[t]), float(b.low[t]), float(b.close[t]))
+            if t < start:
+                continue
+            prefix.advance(t)
+            # последних трёх хаёв/лоёв достаточно для last_structure/bos — результат тот же, что на полном списке
+            tail = sorted(list(highs) + list(lows), key=lambda s: s.idx)
+            yield self._snapshot(t, tail, zone_index, prefix)
+
+    def _snapshot(self, t: int, swings, zone_index: ZoneIndex, prefix: PrefixProfile) -> dict:
+        b, lb = self.bars, self.builder
+        close, ema21 = float(b.close[t]), float(lb.ema21[t])
+        summary = lb.summary_at(t, swings, self.volume, bins=0)
+        prof = prefix.profile(self.bins)
+        if prof is not None:
+            summary.update(poc=prof.poc, vah=prof.vah, val=prof.val)
+        summary["zone_confluence"] = zone_index.confluence(close, 0.5 * float(lb.atr14[t]))
+        htf = lb.htf_trend(t)
+        direction = "long" if close >= ema21 else "short"
+        against = (direction == "long" and htf == "down") or (direction == "short" and htf == "up")
+        risk = self.scorer.recommend(summary, against_htf=against, near_news=False)
+        return {
+            "t": int(b.time[t]),
+            "i": t,
+            "symbol": self.symbol,
+            "close": close,
+            "htf": htf,
+            "summary": {k: asdict(v) if isinstance(v, Zone) else v for k, v in summary.items()},
+            "risk": asdict(risk),
+            "signals": {s.name: s.signal_at(t) for s in self.strategies},
+            "plans": {s: plan_levels(close, ema21, float(self.entry_atr[t]), float(b.high[t - 1]),
+                                     float(b.low[t - 1]), s, self.atr_mult) for s in self.setups},
+        }
+
+    def write(self, path: str, start: int = 100, end: Optional[int] = None) -> int:
+        """Записать поток снимков в JSONL; возвращает число снимков."""
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for snap in self.snapshots(start, end):
+                f.write(json.dumps(snap, ensure_ascii=False))
+                f.write("\n")
+                count += 1
+        return count
+
+
+def load_snapshots(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def snapshot_at(snaps: List[dict], ts_ms: int) -> Optional[dict]:
+    """Последний снимок на момент ts_ms (например, время строки журнала) или None."""
+    i = bisect.bisect_right([s["t"] for s in snaps], ts_ms) - 1
+    return snaps[i] if i >= 0 else None
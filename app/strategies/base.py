@@ -1,14 +1,20 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Union
 import pandas as pd
+from ..core.bars import Bars, as_bars
 
 class StrategyBase(ABC):
     name: str = "Base"
 
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: Union[pd.DataFrame, Bars]):
         self.df = df
+        self.bars = as_bars(df)
 
-    @abstractmethod
     def signal(self) -> Optional[Tuple[float, float]]:
         """Return (entry, stop) or None."""
+        return self.signal_at(len(self.bars) - 1)
+
+    @abstractmethod
+    def signal_at(self, i: int) -> Optional[Tuple[float, float]]:
+        """Signal using bars up to and including i (no look-ahead)."""
         raise NotImplementedError
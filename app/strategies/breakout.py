@@ -1,15 +1,14 @@
 from typing import Optional, Tuple
-import pandas as pd
 from .base import StrategyBase
 
 class BreakoutRange(StrategyBase):
     name = "Пробой диапазона"
 
-    def signal(self) -> Optional[Tuple[float, float]]:
-        df = self.df.copy()
-        hi = float(df["high"].iloc[-20:].max())
-        lo = float(df["low"].iloc[-20:].min())
-        close = float(df["close"].iloc[-1])
+    def signal_at(self, i: int) -> Optional[Tuple[float, float]]:
+        b = self.bars
+        hi = float(b.high[max(0, i - 19):i + 1].max())
+        lo = float(b.low[max(0, i - 19):i + 1].min())
+        close = float(b.close[i])
         if close > hi:
             stop = (hi + lo) / 2
             return (close, stop)
@@ -1,20 +1,24 @@
 from typing import Optional, Tuple
-import pandas as pd
 from ..core.indicators import ema, atr
 from .base import StrategyBase
 
 class PullbackEMA21(StrategyBase):
     name = "Откат к EMA21"
 
-    def signal(self) -> Optional[Tuple[float, float]]:
-        df = self.df.copy()
-        df["ema21"] = ema(df["close"], 21)
-        df["atr14"] = atr(df, 14)
-        c = float(df["close"].iloc[-1])
-        e = float(df["ema21"].iloc[-1])
-        a = float(df["atr14"].iloc[-1])
-        if e > float(df["ema21"].iloc[-5]) and abs(c - e) <= 0.2 * a:
+    def __init__(self, df):
+        super().__init__(df)
+        # индикаторы причинные: значение на баре i не зависит от баров после i
+        self.ema21 = ema(self.bars.close, 21)
+        self.atr14 = atr(self.bars, 14)
+
+    def signal_at(self, i: int) -> Optional[Tuple[float, float]]:
+        if i < 4:
+            return None
+        c = float(self.bars.close[i])
+        e = float(self.ema21[i])
+        a = float(self.atr14[i])
+        if e > float(self.ema21[i - 4]) and abs(c - e) <= 0.2 * a:
             entry = c
-            stop = min(float(df["low"].iloc[-1]), e - 1.5 * a)
+            stop = min(float(self.bars.low[i]), e - 1.5 * a)
             return (entry, stop)
         return None
@@ -11,6 +11,10 @@ from plotly.subplots import make_subplots
 import requests
 import streamlit as st
 
+from ...config.settings import SETUPS
+from ...core.indicators import atr_sma
+from ...core.risk import plan_levels
+
 # ============================ THEME / CSS ============================
 DARK = True
 PRIMARY = "#ff3b3b"
@@ -43,25 +47,79 @@ def ema(series: pd.Series, period: int) -> pd.Series:
 def atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
     if df.empty:
         return pd.Series(dtype="float64")
-    high_low = df["high"] - df["low"]
-    high_close = (df["high"] - df["close"].shift(1)).abs()
-    low_close = (df["low"] - df["close"].shift(1)).abs()
-    tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-    return tr.rolling(period).mean()
-
-def rr_targets(entry: float, stop: float, direction: str, multiples=(1.0, 1.5, 2.0)):
-    r = abs(entry - stop)
-    if r == 0:
-        r = max(entry, 1) * 0.002  # страховой минимум, чтобы не делить на ноль
-    if direction == "long":
-        return [entry + m * r for m in multiples]
-    else:
-        return [entry - m * r for m in multiples]
+    return atr_sma(df, period)
+
+def add_levels(fig, y_values, labels, color, dash="dash", xref="x", yref="y"):
+    # прямое присваивание layout.shapes вместо add_hline/update_layout: те обходят весь template
+    shapes = [dict(type="line", xref=f"{xref} domain", x0=0, x1=1, yref=yref, y0=y, y1=y,
+                   line=dict(color=color, width=1.6, dash=dash)) for y in y_values]
+    notes = [dict(xref=f"{xref} domain", x=1, xanchor="left", yref=yref, y=y, text=label, showarrow=False)
+             for y, label in zip(y_values, labels)]
+    fig.layout.shapes = fig.layout.shapes + tuple(shapes)
+    fig.layout.annotations = fig.layout.annotations + tuple(notes)
 
-def add_levels(fig, y_values, labels, color, dash="dash", row=1, col=1):
-    for y, label in zip(y_values, labels):
-        fig.add_hline(y=y, line=dict(color=color, width=1.6, dash=dash),
-                      annotation_text=label, annotation_position="right", row=row, col=col)
+RISK_CHOICES = {"Низкий (0.5–1%)": 1.2, "Средний (1–2%)": 1.6, "Высокий (2–3%)": 2.0}  # -> ATR-множитель стопа
+
+def with_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["ema21"] = ema(df["close"], 21)
+    df["ema50"] = ema(df["close"], 50)
+    df["ema100"] = ema(df["close"], 100)
+    df["atr14"] = atr(df, 14).bfill().ffill()
+    return df
+
+def compute_levels(df: pd.DataFrame, setup: str, atr_mult: float) -> dict:
+    """Entry/stop/TP по сетапу и ATR-множителю; df — с колонками из with_indicators."""
+    last = df.iloc[-1]
+    prev = df.iloc[-2]
+    return plan_levels(float(last["close"]), float(last["ema21"]), float(last["atr14"]),
+                       float(prev["high"]), float(prev["low"]), setup, atr_mult)
+
+def base_figure(df: pd.DataFrame, symbol: str) -> go.Figure:
+    fig = make_subplots(rows=1, cols=1, shared_xaxes=True)
+    fig.add_trace(go.Candlestick(
+        x=df["open_time"], open=df["open"], high=df["high"], low=df["low"], close=df["close"], name=symbol
+    ))
+    fig.add_trace(go.Scatter(x=df["open_time"], y=df["ema21"], name="EMA21", line=dict(width=1.3)))
+    fig.add_trace(go.Scatter(x=df["open_time"], y=df["ema50"], name="EMA50", line=dict(width=1.0, dash="dot")))
+    fig.add_trace(go.Scatter(x=df["open_time"], y=df["ema100"], name="EMA100", line=dict(width=1.0, dash="dot")))
+    fig.update_layout(
+        height=520, margin=dict(l=20, r=20, t=30, b=20),
+        xaxis_rangeslider_visible=False,
+        template="plotly_dark" if DARK else "plotly_white",
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="left", x=0)
+    )
+    return fig
+
+def levels_figure(fig: go.Figure, lv: dict) -> go.Figure:
+    """Перерисовать уровни на графике на месте (без копии свечей; график — свой у каждой сессии)."""
+    fig.layout.shapes = ()
+    fig.layout.annotations = ()
+    entry, stop, tps = lv["entry"], lv["stop"], lv["tps"]
+    add_levels(fig, [entry], [f"Entry {entry:,.2f}"], "#0bd37d", dash="solid")
+    add_levels(fig, [stop], [f"Stop {stop:,.2f}"], "#ff5252", dash="solid")
+    add_levels(fig, tps, [f"TP{i+1} {v:,.2f}" for i, v in enumerate(tps)], "#9be22a", dash="dash")
+    return fig
+
+# ============================ SESSION MEMO ============================
+MEMO_SIZE = 8  # ключей на сессию (символ × ТФ × бар)
+
+def last_closed_bar(df: pd.DataFrame) -> int:
+    """open_time (мс) последней закрытой свечи; если закрытых нет — последней."""
+    closed = df["close_time"] <= pd.Timestamp.now(tz="UTC")
+    t = df["open_time"][closed].iloc[-1] if closed.any() else df["open_time"].iloc[-1]
+    return int(pd.Timestamp(t).value // 10**6)
+
+def session_memo(key: tuple, build):
+    """Мемоизация промежуточных результатов в st.session_state (LRU на MEMO_SIZE ключей)."""
+    memo = st.session_state.setdefault("_entry_memo", {})
+    if key in memo:
+        memo[key] = memo.pop(key)
+    else:
+        memo[key] = build()
+        while len(memo) > MEMO_SIZE:
+            memo.pop(next(iter(memo)))
+    return memo[key]
 
 # ============================ DATA FETCH (ROBUST) ============================
 BINANCE_HEADERS = {"User-Agent": "swing-mvp/1.1"}
@@ -69,8 +127,9 @@ BINANCE_HEADERS = {"User-Agent": "swing-mvp/1.1"}
 def _klines_to_df(data):
     cols = ["open_time","open","high","low","close","volume","close_time","qav","trades","taker_base","taker_quote","ignore"]
     df = pd.DataFrame(data, columns=cols)
-    df["open_time"]  = df["open_time"].apply(to_datetime_utc)
-    df["close_time"] = df["close_time"].apply(to_datetime_utc)
+    # векторно в datetime64[ms, UTC], без python-datetime на каждую строку
+    df["open_time"]  = pd.to_datetime(df["open_time"].astype("int64"), unit="ms", utc=True)
+    df["close_time"] = pd.to_datetime(df["close_time"].astype("int64"), unit="ms", utc=True)
     for c in ["open","high","low","close","volume"]:
         df[c] = pd.to_numeric(df[c], errors="coerce")
     df.dropna(subset=["open","high","low","close"], inplace=True)
@@ -157,6 +216,17 @@ def get_fear_greed_df(limit_days: int = 180) -> pd.DataFrame:
         return pd.DataFrame(columns=["timestamp","value"])
 
 # ============================ MODAL RENDER ============================
+@st.fragment
+def _fear_greed_section():
+    """Кнопка и модалка F&G — перезапускаются отдельно от остальной вкладки."""
+    if st.button("Индекс страха и жадности", key="btn_fng"):
+        st.session_state["fg_open"] = True
+    if st.session_state.get("fg_open"):
+        _render_fear_greed_modal()
+
+def _close_modal():
+    st.session_state["fg_open"] = False
+
 def _render_fear_greed_modal():
     fg_df = get_fear_greed_df(170)
 
@@ -166,8 +236,7 @@ def _render_fear_greed_modal():
 
     if fg_df.empty:
         st.info("Нет данных Fear & Greed. Попробуй позже.")
-        if st.button("Закрыть"):
-            st.session_state["fg_open"] = False
+        st.button("Закрыть", on_click=_close_modal)
         st.markdown('</div></div>', unsafe_allow_html=True)
         return
 
@@ -201,13 +270,49 @@ def _render_fear_greed_modal():
     sub.update_yaxes(title_text="Цена BTC ($)", row=2, col=1)
 
     st.plotly_chart(sub, use_container_width=True, theme=None)
-    if st.button("Закрыть"):
-        st.session_state["fg_open"] = False
+    st.button("Закрыть", on_click=_close_modal)
     st.markdown('</div></div>', unsafe_allow_html=True)
 
+# ============================ LEVELS FRAGMENT ============================
+@st.fragment
+def _levels_section(symbol: str, df: pd.DataFrame, key: tuple):
+    """Сетап/риск → стоп/TP и их наложение на закэшированный график; перезапускается отдельно."""
+    c1, c2 = st.columns([1.2, 2])
+    with c1:
+        setup = st.radio("Сетап", SETUPS, horizontal=True, index=0, key="setup_radio")
+    with c2:
+        risk_choice = st.radio("Выбери риск", list(RISK_CHOICES), horizontal=True, index=0, key="risk_radio")
+    atr_mult = RISK_CHOICES[risk_choice]
+
+    try:
+        lv = compute_levels(df, setup, atr_mult)
+    except Exception as e:
+        st.error(f"Ошибка расчёта уровней: {e}")
+        return
+
+    base = session_memo(("fig",) + key, lambda: base_figure(df, symbol))
+    st.plotly_chart(levels_figure(base, lv), use_container_width=True, theme=None)
+
+    entry, stop, tps, direction = lv["entry"], lv["stop"], lv["tps"], lv["direction"]
+    rr_abs = abs(entry - stop) or 1e-6
+    if direction == "long":
+        rr_ratio = (tps[0] - entry) / rr_abs
+    else:
+        rr_ratio = (entry - tps[0]) / rr_abs
+    st.markdown(
+        f"**Предложенный риск-контекст:** `RR≈{rr_ratio:.2f}R`, направление: **{direction}**  \n"
+        f"<span class='caption-note'>Уровни рассчитаны из сетапа «{setup}» и ATR×{atr_mult:.1f}.</span>",
+        unsafe_allow_html=True,
+    )
+
 # ============================ PUBLIC ENTRY ============================
 def tab_entry(*_args, **_kwargs):
-    """Главная вкладка «Расчёт входа». Совместима с вызовом tab_entry(journal)."""
+    """Главная вкладка «Расчёт входа». Совместима с вызовом tab_entry(journal).
+
+    Полный перезапуск нужен только при смене монеты/ТФ; кнопка F&G и выбор сетапа/риска
+    живут во фрагментах, а индикаторы и базовый график мемоизируются в сессии
+    по ключу (символ, ТФ, последняя закрытая свеча).
+    """
     st.markdown(PAGE_CSS, unsafe_allow_html=True)
 
     st.title("Вкладка 1 — Расчёт входа")
@@ -216,99 +321,28 @@ def tab_entry(*_args, **_kwargs):
     coins = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "XRPUSDT"]
     tf_map = {"4h": "4h", "1d": "1d"}
 
-    c1, c2, c3 = st.columns([2, 1.2, 1.6])
+    c1, c2 = st.columns([2, 2.8])
     with c1:
         symbol = st.radio("Монета", coins, horizontal=True, index=0, key="symbol_radio")
     with c2:
         tf_label = st.radio("ТФ", list(tf_map.keys()), horizontal=True, index=1, key="tf_radio")
         interval = tf_map[tf_label]
-    with c3:
-        setup = st.radio("Сетап", ["Пробой", "Откат к EMA21"], horizontal=True, index=0, key="setup_radio")
 
-    # Кнопка модалки
-    if st.button("Индекс страха и жадности", key="btn_fng"):
-        st.session_state["fg_open"] = True
+    _fear_greed_section()
 
     # --- Data ---
     limit = 500 if interval == "4h" else 400
-    df = get_klines(symbol, interval, limit)
-    if df.empty or len(df) < 2:
+    raw = get_klines(symbol, interval, limit)
+    if raw.empty or len(raw) < 2:
         st.warning("Недостаточно данных для расчёта.")
-        if st.session_state.get("fg_open"):
-            _render_fear_greed_modal()
         return
 
-    df["ema21"] = ema(df["close"], 21)
-    df["ema50"] = ema(df["close"], 50)
-    df["ema100"] = ema(df["close"], 100)
-    df["atr14"] = atr(df, 14).fillna(method="bfill").fillna(method="ffill")
+    # последняя (формирующаяся) свеча тоже входит в расчёт, поэтому её close — часть ключа
+    key = (symbol, interval, last_closed_bar(raw), float(raw["close"].iloc[-1]))
+    df = session_memo(("ind",) + key, lambda: with_indicators(raw))
 
     last = df.iloc[-1]
-    prev = df.iloc[-2]
-
-    try:
-        if setup == "Откат к EMA21":
-            entry = float(last["ema21"])
-            direction = "long" if last["close"] >= last["ema21"] else "short"
-        else:
-            direction = "long" if last["close"] >= last["ema21"] else "short"
-            entry = float(prev["high"] if direction == "long" else prev["low"])
-
-        atr_mult = 1.2
-        risk_choice = st.radio("Выбери риск", ["Низкий (0.5–1%)", "Средний (1–2%)", "Высокий (2–3%)"],
-                               horizontal=True, index=0, key="risk_radio")
-        if "Средний" in risk_choice:
-            atr_mult = 1.6
-        elif "Высокий" in risk_choice:
-            atr_mult = 2.0
-
-        if direction == "long":
-            stop = entry - atr_mult * float(last["atr14"])
-        else:
-            stop = entry + atr_mult * float(last["atr14"])
-
-        tps = rr_targets(entry, stop, direction, (1.0, 1.5, 2.0))
-    except Exception as e:
-        st.error(f"Ошибка расчёта уровней: {e}")
-        if st.session_state.get("fg_open"):
-            _render_fear_greed_modal()
-        return
-
     st.caption(f"ATR14: {float(last['atr14']):.2f} | EMA21/50/100: "
                f"{float(last['ema21']):.2f}/{float(last['ema50']):.2f}/{float(last['ema100']):.2f}")
 
-    # --- Chart ---
-    fig = make_subplots(rows=1, cols=1, shared_xaxes=True)
-    fig.add_trace(go.Candlestick(
-        x=df["open_time"], open=df["open"], high=df["high"], low=df["low"], close=df["close"], name=symbol
-    ))
-    fig.add_trace(go.Scatter(x=df["open_time"], y=df["ema21"], name="EMA21", line=dict(width=1.3)))
-    fig.add_trace(go.Scatter(x=df["open_time"], y=df["ema50"], name="EMA50", line=dict(width=1.0, dash="dot")))
-    fig.add_trace(go.Scatter(x=df["open_time"], y=df["ema100"], name="EMA100", line=dict(width=1.0, dash="dot")))
-
-    add_levels(fig, [entry], [f"Entry {entry:,.2f}"], "#0bd37d", dash="solid")
-    add_levels(fig, [stop], [f"Stop {stop:,.2f}"], "#ff5252", dash="solid")
-    add_levels(fig, tps, [f"TP{i+1} {v:,.2f}" for i, v in enumerate(tps)], "#9be22a", dash="dash")
-
-    fig.update_layout(
-        height=520, margin=dict(l=20, r=20, t=30, b=20),
-        xaxis_rangeslider_visible=False,
-        template="plotly_dark" if DARK else "plotly_white",
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="left", x=0)
-    )
-    st.plotly_chart(fig, use_container_width=True, theme=None)
-
-    rr_abs = abs(entry - stop) or 1e-6
-    if direction == "long":
-        rr_ratio = (tps[0] - entry) / rr_abs
-    else:
-        rr_ratio = (entry - tps[0]) / rr_abs
-    st.markdown(
-        f"**Предложенный риск-контекст:** `RR≈{rr_ratio:.2f}R`, направление: **{direction}**  \n"
-        f"<span class='caption-note'>Уровни рассчитаны из сетапа «{setup}» и ATR×{atr_mult:.1f}.</span>",
-        unsafe_allow_html=True,
-    )
-
-    # --- Modal draw ---
-    if st.session_state.get("fg_open"):
-        _render_fear_greed_modal()
+    _levels_section(symbol, df, key)
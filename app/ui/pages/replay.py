@@ -0,0 +1,53 @@
+import json
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from ...config.settings import SETUPS
+from ...services.replay import BarReplay
+from .entry import DARK, add_levels, get_klines
+
+@st.cache_data(ttl=60*30, show_spinner="Реплей истории…")
+def replay_snapshots(symbol: str, interval: str, limit: int):
+    df = get_klines(symbol, interval, limit)
+    if len(df) < 120:
+        return df, []
+    return df, list(BarReplay(df, symbol).snapshots())
+
+def tab_replay():
+    st.subheader("Реплей — что показала бы вкладка входа на каждой свече")
+    coins = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "XRPUSDT"]
+    c1, c2, c3 = st.columns([2, 1, 1.6])
+    with c1:
+        symbol = st.radio("Монета", coins, horizontal=True, index=0, key="replay_symbol")
+    with c2:
+        interval = st.radio("ТФ", ["4h", "1d"], horizontal=True, index=1, key="replay_tf")
+    with c3:
+        setup = st.radio("Сетап", SETUPS, horizontal=True, index=0, key="replay_setup")
+
+    df, snaps = replay_snapshots(symbol, interval, 1000)
+    if not snaps:
+        st.info("Недостаточно истории для реплея.")
+        return
+
+    k = st.slider("Свеча", 0, len(snaps) - 1, len(snaps) - 1, key="replay_pos")
+    snap = snaps[k]
+    view = df.iloc[max(0, snap["i"] - 150):snap["i"] + 1]
+    plan = snap["plans"][setup]
+
+    fig = go.Figure(go.Candlestick(x=view["open_time"], open=view["open"], high=view["high"],
+                                   low=view["low"], close=view["close"], name=symbol))
+    add_levels(fig, [plan["entry"]], [f"Entry {plan['entry']:,.2f}"], "#0bd37d", dash="solid")
+    add_levels(fig, [plan["stop"]], [f"Stop {plan['stop']:,.2f}"], "#ff5252", dash="solid")
+    add_levels(fig, plan["tps"], [f"TP{i+1} {v:,.2f}" for i, v in enumerate(plan["tps"])], "#9be22a")
+    fig.update_layout(height=480, margin=dict(l=20, r=20, t=30, b=20), xaxis_rangeslider_visible=False,
+                      template="plotly_dark" if DARK else "plotly_white")
+    st.plotly_chart(fig, use_container_width=True, theme=None)
+
+    risk = snap["risk"]
+    st.markdown(f"**{pd.to_datetime(snap['t'], unit='ms', utc=True):%Y-%m-%d %H:%M}** · "
+                f"структура `{snap['summary']['structure']}` · HTF `{snap['htf']}` · "
+                f"риск `{risk['bracket']} {risk['percent']}%` ({risk['reason']})")
+    st.json({"signals": snap["signals"], "summary": snap["summary"]}, expanded=False)
+    st.download_button("Скачать поток снимков (JSONL)",
+                       "\n".join(json.dumps(s, ensure_ascii=False) for s in snaps),
+                       file_name=f"replay_{symbol}_{interval}.jsonl", key="replay_dl")
@@ -0,0 +1,70 @@
+"""Память на символ: DataFrame (как в entry.py / binance_feed) против Bars.
+
+Запуск: python bench/bench_bars.py [n_bars] [n_symbols]
+"""
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.core.bars import Bars
+from app.core.levels import LevelBuilder
+
+
+def synthetic_klines(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.005, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.005, n))
+    vol = rng.uniform(10, 1000, n)
+    t = 1_600_000_000_000 + np.arange(n, dtype=np.int64) * 4 * 3600 * 1000
+    return pd.DataFrame({"open_time": t, "open": open_, "high": high, "low": low,
+                         "close": close, "volume": vol, "close_time": t + 4 * 3600 * 1000 - 1})
+
+
+def legacy_frame(raw: pd.DataFrame) -> pd.DataFrame:
+    """Старый _klines_to_df: python-datetime на каждую строку (object dtype)."""
+    df = raw.copy()
+    for c in ("open_time", "close_time"):
+        df[c] = df[c].apply(lambda ts: datetime.fromtimestamp(ts / 1000, tz=timezone.utc))
+    return df
+
+
+def main(n_bars: int = 500, n_symbols: int = 300):
+    raw = synthetic_klines(n_bars)
+    legacy = legacy_frame(raw)
+    bars = Bars.from_frame(raw)
+
+    # сверх входных данных: раньше LevelBuilder держал копию DataFrame + 4 колонки индикаторов,
+    # теперь — только массивы индикаторов (Bars разделяется с вызывающим кодом)
+    lb_before = legacy.memory_usage(deep=True).sum() + 4 * n_bars * 8
+    lb = LevelBuilder(bars)
+    lb_after = sum(getattr(lb, c).nbytes for c in ("ema21", "ema50", "ema100", "atr14"))
+
+    rows = [
+        ("DataFrame (object datetime)", legacy.memory_usage(deep=True).sum()),
+        ("DataFrame (datetime64)", Bars.from_frame(raw).to_frame().memory_usage(deep=True).sum()),
+        ("Bars float64", bars.nbytes),
+        ("Bars float32", bars.astype(np.float32).nbytes),
+        ("LevelBuilder extra (before)", lb_before),
+        ("LevelBuilder extra (after)", lb_after),
+    ]
+    print(f"bars/symbol={n_bars}, symbols={n_symbols}")
+    for name, b in rows:
+        print(f"{name:<30} {b / 1024:9.1f} KiB/symbol  {b * n_symbols / 2**20:8.2f} MiB/universe")
+
+    for label, data in (("DataFrame", legacy), ("Bars", bars)):
+        t0 = time.perf_counter()
+        for _ in range(50):
+            LevelBuilder(data).build_summary()
+        print(f"LevelBuilder.build_summary({label}): {(time.perf_counter() - t0) / 50 * 1e3:.2f} ms/call")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
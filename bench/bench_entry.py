@@ -0,0 +1,75 @@
+"""Задержка взаимодействия на вкладке входа: полный rerun против фрагмента (смена риска/сетапа).
+
+Полный rerun: журнал + индикаторы + базовый график + уровни. Фрагмент: только уровни и
+наложение на мемоизированный график. Сессии Streamlit делят один процесс (и GIL),
+поэтому N одновременных сессий моделируются пулом потоков.
+
+Запуск: python bench/bench_entry.py [n_sessions] [interactions_per_session]
+"""
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.services.journal import TradeJournal
+from app.ui.pages.entry import (RISK_CHOICES, SETUPS, base_figure, compute_levels,
+                                levels_figure, with_indicators)
+from bench_bars import synthetic_klines
+
+
+def entry_frame(n: int = 500) -> pd.DataFrame:
+    df = synthetic_klines(n)
+    for c in ("open_time", "close_time"):
+        df[c] = pd.to_datetime(df[c], unit="ms", utc=True)
+    return df
+
+
+def full_rerun(raw, journal_path, setup, mult):
+    TradeJournal(journal_path)
+    df = with_indicators(raw)
+    return levels_figure(base_figure(df, "BTCUSDT"), compute_levels(df, setup, mult))
+
+
+def fragment_rerun(df, base, setup, mult):
+    return levels_figure(base, compute_levels(df, setup, mult))
+
+
+def run(n_sessions: int, interactions: int, make_fn) -> float:
+    def session(_):
+        fn = make_fn()  # своё состояние на сессию, как session_state в Streamlit
+        lat = []
+        for i in range(interactions):
+            setup = SETUPS[i % len(SETUPS)]
+            mult = list(RISK_CHOICES.values())[i % len(RISK_CHOICES)]
+            t0 = time.perf_counter()
+            fn(setup, mult)
+            lat.append(time.perf_counter() - t0)
+        return lat
+
+    with ThreadPoolExecutor(n_sessions) as pool:
+        lats = [x for s in pool.map(session, range(n_sessions)) for x in s]
+    return sum(lats) / len(lats) * 1e3
+
+
+def main(n_sessions: int = 16, interactions: int = 10):
+    raw = entry_frame()
+    journal_path = str(Path(tempfile.mkdtemp()) / "journal.csv")
+
+    def fragment_session():
+        df = with_indicators(raw)
+        base = base_figure(df, "BTCUSDT")
+        return lambda s, m: fragment_rerun(df, base, s, m)
+
+    for n in sorted({1, n_sessions}):
+        full = run(n, interactions, lambda: lambda s, m: full_rerun(raw, journal_path, s, m))
+        frag = run(n, interactions, fragment_session)
+        print(f"sessions={n:<4} full rerun {full:8.1f} ms   fragment {frag:8.1f} ms   x{full / frag:.1f}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
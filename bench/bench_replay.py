@@ -0,0 +1,93 @@
+"""Скорость реплея: BarReplay против наивного пересчёта пайплайна на срезе df[:t+1].
+
+Заодно проверяет, что снимок на баре t совпадает с пайплайном на срезе (несколько баров).
+
+Запуск: python bench/bench_replay.py [n_bars]
+"""
+import json
+import math
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.config.settings import MIN_RR, SETUPS
+from app.core.bars import Bars
+from app.core.levels import LevelBuilder, Zone
+from app.core.risk import RiskScorer
+from app.core.zones import ZoneIndex
+from app.services.replay import BarReplay
+from app.strategies.breakout import BreakoutRange
+from app.strategies.pullback import PullbackEMA21
+from app.ui.pages.entry import compute_levels, with_indicators
+from bench_entry import entry_frame
+
+
+def sliced_snapshot(df, t: int) -> dict:
+    """Пайплайн вкладки входа на срезе df[:t+1] в формате снимка BarReplay."""
+    sl = df.iloc[:t + 1]
+    lb = LevelBuilder(sl)
+    summary = lb.build_summary(ZoneIndex())
+    close, ema21 = float(lb.bars.close[-1]), float(lb.ema21[-1])
+    htf = lb.htf_trend()
+    direction = "long" if close >= ema21 else "short"
+    against = (direction == "long" and htf == "down") or (direction == "short" and htf == "up")
+    wi = with_indicators(sl)
+    return {
+        "htf": htf,
+        "summary": {k: asdict(v) if isinstance(v, Zone) else v for k, v in summary.items()},
+        "risk": asdict(RiskScorer(MIN_RR).recommend(summary, against_htf=against, near_news=False)),
+        "signals": {s.name: s.signal() for s in (BreakoutRange(sl), PullbackEMA21(sl))},
+        "plans": {s: compute_levels(wi, s, 1.2) for s in SETUPS},
+    }
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float):
+        return (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+    return a == b
+
+
+def check_against_slices(df, indices) -> list:
+    """Бары, на которых снимок реплея расходится с пайплайном на срезе (пустой список — всё сходится)."""
+    indices = sorted(indices)
+    snaps = {s["i"]: s for s in BarReplay(df).snapshots(indices[0], indices[-1] + 1)}
+    bad = []
+    for t in indices:
+        ref = json.loads(json.dumps(sliced_snapshot(df, t)))  # Zone/tuple → как в JSONL
+        snap = json.loads(json.dumps({k: snaps[t][k] for k in ref}))
+        if not _same(ref, snap):
+            bad.append(t)
+    return bad
+
+
+def main(n_bars: int = 5000):
+    df = entry_frame(n_bars)
+    bars = Bars.from_frame(df)
+    path = str(Path(tempfile.mkdtemp()) / "replay.jsonl")
+
+    bad = check_against_slices(df, [100, 101, n_bars // 2, n_bars - 1])
+    print(f"replay == slice pipeline: {'ok' if not bad else f'MISMATCH at {bad}'}")
+
+    t0 = time.perf_counter()
+    n = BarReplay(bars, "BTCUSDT").write(path)
+    dt = time.perf_counter() - t0
+    print(f"BarReplay: {n} snapshots in {dt:.2f} s → {n / dt:,.0f} bars/s")
+
+    sample = range(n_bars - 20, n_bars)  # наивный вариант — только 20 последних баров
+    t0 = time.perf_counter()
+    for t in sample:
+        LevelBuilder(bars[:t + 1]).build_summary(ZoneIndex())
+    dt = time.perf_counter() - t0
+    print(f"re-slice per bar: {len(sample) / dt:,.0f} bars/s (summary only)")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:2]))